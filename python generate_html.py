@@ -1,8 +1,18 @@
 import json
 import random
 import os
-from openai import OpenAI
-from google.genai import Client as GeminiClient 
+import asyncio
+import atexit
+import hashlib
+import html
+import re
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+try:
+    import orjson # インストールされていれば、history.jsonの読み書きに高速なorjsonを使う
+except ImportError:
+    orjson = None
 from datetime import datetime 
 
 # ======================
@@ -15,55 +25,143 @@ if not OPENAI_API_KEY and not GOOGLE_API_KEY:
     raise ValueError("❌ OPENAI_API_KEY または GOOGLE_API_KEY が設定されていません。")
 
 # ======================
-# クライアント初期化
+# 紹介文生成の設定
 # ======================
-openai_client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+DESCRIPTION_CONCURRENCY = 10 # 同時リクエスト数 (APIのレート制限対策)
+DESCRIPTION_BATCH_SIZE = 10 # 1回のリクエストでまとめて生成するタイトル数
+HISTORY_PAGE_WORKERS = 8 # 過去の日付ページを並行して生成するスレッド数
+DESCRIPTION_FALLBACK = "説明文を生成できませんでした。"
+HTML_WRITE_BUFFER_SIZE = 1 << 20 # HTML書き出し時のバッファサイズ (1ページ分が丸ごと収まり、閉じる時の1回の書き込みで済む)
+HISTORY_DISPLAY_LIMIT = 30 # サイドバーに表示する過去の日数
 
 # SCRIPT_DIRやファイル名を定義
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 HISTORY_FILE_NAME = "history.json"
 CURRENT_WEEK_FILE_NAME = "current_week.json"
+HISTORY_FILE_PATH = os.path.join(SCRIPT_DIR, HISTORY_FILE_NAME)
+CURRENT_WEEK_FILE_PATH = os.path.join(SCRIPT_DIR, CURRENT_WEEK_FILE_NAME)
+DESC_CACHE_FILE_NAME = "desc_cache.json"
+
+# ======================
+# JSONファイルの読み書き (orjsonがあれば使い、無ければ標準のjsonにフォールバック)
+# ======================
+def load_json_file(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    # orjson.JSONDecodeError は json.JSONDecodeError のサブクラスなので、呼び出し側の例外処理はそのまま使える
+    return orjson.loads(data) if orjson else json.loads(data)
+
+# ファイルが無い・壊れている場合は既定値を返す (壊れている場合のみ警告を出す)
+def load_json_or_default(path, default):
+    try:
+        return load_json_file(path)
+    except FileNotFoundError:
+        return default
+    except json.JSONDecodeError:
+        print(f"⚠️ {os.path.basename(path)} が破損しているため、空のデータとして扱います。")
+        return default
+
+# 一時ファイルに書き終えてから os.replace で置き換える (途中で落ちても壊れたファイルが残らない)
+def dump_json_file(path, obj):
+    tmp_path = path + ".tmp"
+    if orjson:
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+    else:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(obj, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+# ======================
+# 紹介文キャッシュ (タイトルのハッシュ → 紹介文) の読み込み
+# ======================
+DESC_CACHE_FILE_PATH = os.path.join(SCRIPT_DIR, DESC_CACHE_FILE_NAME)
+
+desc_cache = load_json_or_default(DESC_CACHE_FILE_PATH, {})
+desc_cache_saved_count = len(desc_cache)
+
+# 同じタイトルのキーは1回の実行中に何度も引かれるため、計算結果をメモ化する
+@lru_cache(maxsize=4096)
+def desc_cache_key(title):
+    return hashlib.blake2b(title.encode("utf-8"), digest_size=16).hexdigest()
+
+# 新しい紹介文があればまとめて書き戻す (dump_json_file が一時ファイル経由で置き換える)
+# 生成処理の直後に呼び、念のため終了時にも呼ぶ
+def save_desc_cache():
+    global desc_cache_saved_count
+    if len(desc_cache) == desc_cache_saved_count:
+        return
+    dump_json_file(DESC_CACHE_FILE_PATH, desc_cache)
+    desc_cache_saved_count = len(desc_cache)
+    print(f"✅ {DESC_CACHE_FILE_NAME} を保存しました。（{len(desc_cache)}件）")
+
+atexit.register(save_desc_cache)
 
 # ======================
 # 過去のオススメHTML生成 (サイドバー用)
 # ======================
-def generate_history_html():
-    history_file_path = os.path.join(SCRIPT_DIR, HISTORY_FILE_NAME)
-    history_html = '<div class="history-list">\n'
-    
-    history = [] # 履歴データを初期化
-    
-    if os.path.exists(history_file_path):
-        try:
-            with open(history_file_path, "r", encoding="utf-8") as f:
-                history = json.load(f)
-        except Exception as e:
-            # 読み込みエラー（JSONデコードエラーを含む）が発生した場合、履歴を空として扱い、エラーメッセージは表示しない
-            print(f"⚠️ 履歴ファイルの読み込みでエラーが発生しましたが、履歴無しとして扱います: {e}")
-            history = []
-            
-    history_html += '<h3>過去のオススメ</h3>\n'
-
-    if history:
-        display_limit = 30
-        
-        for entry in history[:display_limit]:
-            raw_filename = entry.get("filename", f"recommend_{entry['date'].replace('/', '')}.html")
-            history_html += f'  <p class="history-date"><a href="{raw_filename}">{entry["date"]}</a></p>\n' 
+def generate_history_html(history):
+    # サイドバーに必要なのは表示する日付・ファイル名と総件数だけなので、それをキーにして生成結果をメモ化する
+    # (将来ページごとに呼ばれるようになっても、同じ履歴なら組み立ては一度だけ)
+    history_key = tuple(
+        (entry["date"], entry.get("filename", f"recommend_{entry['date'].replace('/', '')}.html"))
+        for entry in history[:HISTORY_DISPLAY_LIMIT]
+    )
+    return build_history_sidebar(history_key, len(history))
+
+@lru_cache(maxsize=1)
+def build_history_sidebar(history_key, history_count):
+    # 文字列の += を繰り返さず、リストに溜めて最後に一度だけ結合する
+    parts = ['<div class="history-list">\n', '<h3>過去のオススメ</h3>\n']
+
+    if history_key:
+        for date, raw_filename in history_key:
+            # サイドバーは一度しか組み立てないため、ここでエスケープしても負担にならない
+            raw_filename, date = html.escape(raw_filename), html.escape(date)
+            parts.append(f'  <p class="history-date"><a href="{raw_filename}">{date}</a></p>\n')
         
-        if len(history) > display_limit:
-             history_html += f'  <p class="history-date history-more">... 他 {len(history) - display_limit}日分</p>\n'
+        if history_count > HISTORY_DISPLAY_LIMIT:
+            parts.append(f'  <p class="history-date history-more">... 他 {history_count - HISTORY_DISPLAY_LIMIT}日分</p>\n')
     else:
-        # historyが空の場合（ファイルなし、または読み込みエラー）
-        history_html += '<p>履歴無し</p>'
+        # historyが空の場合（ファイルなし、または読み込みエラーで空リストが渡された場合）
+        parts.append('<p>履歴無し</p>')
         
-    history_html += '</div>\n'
-    return history_html
+    parts.append('</div>\n')
+    return "".join(parts)
 
 # ======================
-# AIで紹介文生成 (Gemini呼び出し修正済み)
+# 各AIへの紹介文リクエスト (失敗時は例外を送出)
 # ======================
-def generate_description(title):
+async def request_openai_description(openai_client, title, prompt):
+    print(f"🧠 ChatGPTで生成中: {title}")
+    res = await openai_client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=60
+    )
+    return res.choices[0].message.content.strip()
+
+@lru_cache(maxsize=1)
+def get_gemini_client():
+    # Geminiクライアントは呼び出しのたびに作らず、最初に必要になった時に一度だけ生成して使い回す
+    # (google.genaiはimportが重いため、実際にGeminiを呼ぶ時まで読み込まない)
+    from google.genai import Client as GeminiClient
+    return GeminiClient(api_key=GOOGLE_API_KEY)
+
+async def request_gemini_description(title, prompt):
+    print(f"✨ Geminiで生成中: {title}")
+    gemini_client = get_gemini_client()
+
+    res = await gemini_client.aio.models.generate_content(
+        model='gemini-2.5-flash',
+        contents=prompt
+    )
+    return res.text.strip()
+
+# ======================
+# AIで紹介文生成 (非同期版)
+# ======================
+async def generate_description_async(title, openai_client, semaphore):
     prompt = f"""
 商品タイトル: {title}
 あなたは親しみやすいペット用品のブロガーです。
@@ -73,124 +171,248 @@ def generate_description(title):
 - **目的:** 読者が商品をクリックして購入したくなるように誘導する。
 """
 
-    # 1. ChatGPTの試行
-    if openai_client:
+    # 生成済みのタイトルはキャッシュから返す (APIを呼ばない)
+    key = desc_cache_key(title)
+    if key in desc_cache:
+        return desc_cache[key]
+
+    # 同時リクエスト数をセマフォで制限
+    async with semaphore:
+        # 両方のAPIキーがある場合は同時にリクエストし、先に成功した方を採用する
+        # (片方がタイムアウトしても、もう片方の応答を待つだけで済む)
+        if openai_client and GOOGLE_API_KEY:
+            tasks = {
+                asyncio.create_task(request_openai_description(openai_client, title, prompt)): "ChatGPT",
+                asyncio.create_task(request_gemini_description(title, prompt)): "Gemini",
+            }
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        for other in pending:
+                            other.cancel()
+                        desc_cache[key] = task.result()
+                        return desc_cache[key]
+                    print(f"⚠️ {tasks[task]}エラー: {task.exception()}")
+            return DESCRIPTION_FALLBACK
+
+        # 1. ChatGPTの試行
+        if openai_client:
+            try:
+                desc_cache[key] = await request_openai_description(openai_client, title, prompt)
+                return desc_cache[key]
+            except Exception as e:
+                print(f"⚠️ ChatGPTエラー発生（Geminiへ切り替え）: {e}")
+
+        # 2. Geminiの試行 (OpenAIが利用不可の場合)
+        if GOOGLE_API_KEY:
+            try:
+                desc_cache[key] = await request_gemini_description(title, prompt)
+                return desc_cache[key]
+            except Exception as e:
+                print(f"⚠️ Geminiエラー: {e}")
+
+    return DESCRIPTION_FALLBACK
+
+# ======================
+# 複数タイトルの紹介文を1回のリクエストでまとめて生成
+# ======================
+async def generate_descriptions_batch(titles, openai_client, semaphore):
+    prompt = f"""
+あなたは親しみやすいペット用品のブロガーです。
+以下の商品タイトル一覧のそれぞれについて、以下の条件で魅力的な紹介文（日本語で30文字〜60文字程度）を作ってください。
+- **ターゲット:** 犬や猫の飼い主、特にペットの健康や楽しさを重視する人。
+- **トーン:** 親しみやすく、ワクワクさせるような口調。
+- **目的:** 読者が商品をクリックして購入したくなるように誘導する。
+結果は {{"descriptions": ["紹介文1", "紹介文2", ...]}} の形式のJSONで、タイトル一覧と同じ順番・同じ件数で返してください。
+商品タイトル一覧: {json.dumps(titles, ensure_ascii=False)}
+"""
+
+    descs = None
+    async with semaphore:
         try:
-            print(f"🧠 ChatGPTで生成中: {title}")
-            res = openai_client.chat.completions.create(
-                model="gpt-4o-mini", 
+            print(f"🧠 ChatGPTで{len(titles)}件まとめて生成中")
+            res = await openai_client.chat.completions.create(
+                model="gpt-4o-mini",
                 messages=[{"role": "user", "content": prompt}],
-                max_tokens=60
+                max_tokens=100 * len(titles),
+                response_format={"type": "json_object"}
             )
-            return res.choices[0].message.content.strip()
+            descs = json.loads(res.choices[0].message.content)["descriptions"]
+            if len(descs) != len(titles) or not all(isinstance(d, str) and d.strip() for d in descs):
+                raise ValueError(f"{len(titles)}件に対して{len(descs)}件の紹介文が返されました")
         except Exception as e:
-            print(f"⚠️ ChatGPTエラー発生（Geminiへ切り替え）: {e}")
+            print(f"⚠️ まとめて生成できなかったため、1件ずつ生成します: {e}")
+            descs = None
+
+    # 失敗した場合は1件ずつ生成 (セマフォを解放してから呼ぶ)
+    if descs is None:
+        await asyncio.gather(*[generate_description_async(title, openai_client, semaphore) for title in titles])
+        return
 
-    # 2. Geminiの試行 (OpenAIが失敗/利用不可の場合)
-    if GOOGLE_API_KEY: 
+    for title, desc in zip(titles, descs):
+        desc_cache[desc_cache_key(title)] = desc.strip()
+
+# ======================
+# 複数商品の紹介文をまとめて並行生成
+# ======================
+async def generate_descriptions(titles):
+    # キャッシュに無いタイトルだけを重複なしで生成する
+    missing_titles = list(dict.fromkeys(t for t in titles if desc_cache_key(t) not in desc_cache))
+
+    if missing_titles:
+        # AsyncOpenAIのHTTPセッションはイベントループに紐づくため、ループごとに生成して最後に閉じる
+        # (SDKのimportも重いため、キャッシュに無いタイトルがある時だけ行う)
+        if OPENAI_API_KEY:
+            from openai import AsyncOpenAI
+            openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+        else:
+            openai_client = None
+        semaphore = asyncio.Semaphore(DESCRIPTION_CONCURRENCY)
         try:
-            print(f"✨ Geminiで生成中: {title}")
-            gemini_client = GeminiClient(api_key=GOOGLE_API_KEY) 
-            
-            res = gemini_client.models.generate_content(
-                model='gemini-2.5-flash', 
-                contents=prompt
-            )
-            return res.text.strip()
-        except Exception as e:
-            print(f"⚠️ Geminiエラー: {e}")
+            if openai_client:
+                batches = [missing_titles[i:i + DESCRIPTION_BATCH_SIZE] for i in range(0, len(missing_titles), DESCRIPTION_BATCH_SIZE)]
+                tasks = [generate_descriptions_batch(batch, openai_client, semaphore) for batch in batches]
+            else:
+                tasks = [generate_description_async(title, None, semaphore) for title in missing_titles]
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            if openai_client:
+                await openai_client.close()
 
-    return "説明文を生成できませんでした。"
+    # 生成結果はすべてキャッシュに入っている (失敗したものは既定の文言)
+    return [desc_cache.get(desc_cache_key(title), DESCRIPTION_FALLBACK) for title in titles]
 
-# =========================================================
-# 日ごとの履歴HTMLを生成する関数 (generate_daily_html)
-# =========================================================
-def generate_daily_html(items, page_title, filename_with_path, history_sidebar):
-    
-    # HTMLの共通ヘッダー部分
-    html_content = f"""<!DOCTYPE html>
-<html lang="ja">
-<head>
-    <meta charset="UTF-8">
-    <title>{page_title}</title>
-    <style>
-        /* ... (CSSスタイルは省略なし) ... */
-        .header-container {{
+# ======================
+# 全ページで使う紹介文を一括で用意する (タイトル → 紹介文)
+# ======================
+def build_desc_map(titles):
+    # 同じ商品が複数の日に登場しても、紹介文の生成は1回だけにする
+    unique_titles = list(dict.fromkeys(titles))
+    descs = asyncio.run(generate_descriptions(unique_titles))
+
+    # 後続のHTML生成で落ちたりプロセスが強制終了されても、生成済みの紹介文は失わないようにすぐ保存する
+    save_desc_cache()
+    return dict(zip(unique_titles, descs))
+
+# ======================
+# 生成済みの紹介文を履歴の商品に書き込む (次回以降の再生成でAIもキャッシュも引かずに済むように)
+# ======================
+def store_descs_in_history(history, desc_map):
+    stored_count = 0
+    for entry in history:
+        for item in entry['items']:
+            desc = desc_map.get(item['title'])
+            # 生成に失敗した商品は保存せず、次回に生成し直させる
+            if 'desc' not in item and desc and desc != DESCRIPTION_FALLBACK:
+                item['desc'] = desc
+                stored_count += 1
+    return stored_count
+
+# ======================
+# HTMLテンプレート (モジュール読み込み時に一度だけ定義)
+# ======================
+# 全ページ共通のCSS (プレースホルダーを含まないため、波括弧はエスケープしない)
+PAGE_CSS = """        /* ... (CSSスタイルは省略なし) ... */
+        .header-container {
             display: flex;
             align-items: center;
             justify-content: center;
             margin-bottom: 20px;
-        }}
-        .header-title-box {{
+        }
+        .header-title-box {
             border: 3px solid #000;
             padding: 10px 30px;
             margin: 0 20px;
             text-align: center;
             flex-grow: 1;
-        }}
-        .header-title-box h1 {{
+        }
+        .header-title-box h1 {
             margin: 0;
             font-size: 2em;
-        }}
-        .header-image {{
+        }
+        .header-image {
             width: 80px;
             height: 80px;
             border-radius: 50%;
             border: 2px solid #000;
-            overflow: hidden; 
-        }}
-        .header-image img {{
+            overflow: hidden;
+        }
+        .header-image img {
             width: 100%;
             height: 100%;
-            object-fit: cover; 
+            object-fit: cover;
             display: block;
-        }}
+        }
         
-        body {{ font-family: sans-serif; }}
-        #container {{ width: 90%; max-width: 1000px; margin: 20px auto; display: flex; border: 1px solid #ddd; padding: 10px; }}
-        #sidebar {{ width: 220px; padding: 10px 15px; border-right: 1px solid #eee; margin-right: 20px; }}
-        #main-content {{ flex-grow: 1; }}
+        body { font-family: sans-serif; }
+        #container { width: 90%; max-width: 1000px; margin: 20px auto; display: flex; border: 1px solid #ddd; padding: 10px; }
+        #sidebar { width: 220px; padding: 10px 15px; border-right: 1px solid #eee; margin-right: 20px; }
+        #main-content { flex-grow: 1; }
         
-        .history-list h3 {{ margin-top: 0; border-bottom: 2px solid #ccc; padding-bottom: 5px; }}
-        .history-date {{ font-size: 0.9em; margin: 3px 0; }}
-        .history-date a {{ color: #007bff; text-decoration: none; }}
-        .history-date.history-more {{ font-style: italic; color: #888; }}
-        .error {{ color: red; font-weight: bold; }}
+        .history-list h3 { margin-top: 0; border-bottom: 2px solid #ccc; padding-bottom: 5px; }
+        .history-date { font-size: 0.9em; margin: 3px 0; }
+        .history-date a { color: #007bff; text-decoration: none; }
+        .history-date.history-more { font-style: italic; color: #888; }
+        .error { color: red; font-weight: bold; }
 
-        ul {{ list-style-type: none; padding: 0; }}
+        ul { list-style-type: none; padding: 0; }
         
         /* 💡 修正点: 商品リストのレイアウトを改善するためのCSS */
-        li {{ 
-            border-bottom: 1px solid #ccc; 
-            margin-bottom: 20px; 
-            padding: 15px 0; 
+        li {
+            border-bottom: 1px solid #ccc;
+            margin-bottom: 20px;
+            padding: 15px 0;
             display: flex; /* Flexboxで画像とテキストを横並びにする */
             align-items: flex-start; /* 上揃え */
             flex-wrap: wrap;
-        }}
+        }
         
         /* 💡 修正点: 画像コンテナのスタイル */
-        .item-image-container {{
+        .item-image-container {
             flex: 0 0 150px; /* 画像の幅を固定 */
             margin-right: 20px;
-        }}
+        }
         
         /* 💡 修正点: 画像そのもののスタイル */
-        img {{ 
-            display: block; 
-            border-radius: 4px; 
-            max-width: 150px; 
-            height: auto; 
+        img {
+            display: block;
+            border-radius: 4px;
+            max-width: 150px;
+            height: auto;
             margin: 0; /* 画像周りの余計なマージンを削除 */
-        }}
+        }
         
         /* 💡 修正点: テキストコンテナのスタイル */
-        .item-details {{
+        .item-details {
             flex-grow: 1; /* 残りのスペースを占有 */
-        }}
+        }
         
-        .price {{ font-weight: bold; color: #E91E63; font-size: 1.1em; }}
-        .item-details p {{ margin: 5px 0; }} /* 詳細内の段落マージンを調整 */
+        .price { font-weight: bold; color: #E91E63; font-size: 1.1em; }
+        .item-details p { margin: 5px 0; } /* 詳細内の段落マージンを調整 */
+"""
+
+# ======================
+# CSSの縮小 (コメントと余分な空白を取り除き、全ページのファイルサイズを減らす)
+# ======================
+def minify_css(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL) # コメントを削除
+    css = re.sub(r"\s+", " ", css) # 連続する空白・改行を1つにまとめる
+    css = re.sub(r"\s*([{};,])\s*", r"\1", css) # 記号の前後の空白を削除
+    css = re.sub(r":\s+", ":", css) # プロパティ名と値の間の空白を削除
+    return css.replace(";}", "}").strip()
+
+# 縮小はモジュール読み込み時に一度だけ行う
+PAGE_CSS_MIN = minify_css(PAGE_CSS)
+# 共通ヘッダー部分のサイドバーより前 (CSSの波括弧は str.format 用にエスケープして埋め込む)
+PRE_SIDEBAR_TEMPLATE = """<!DOCTYPE html>
+<html lang="ja">
+<head>
+    <meta charset="UTF-8">
+    <title>{page_title}</title>
+    <style>
+""" + PAGE_CSS_MIN.replace("{", "{{").replace("}", "}}") + """
     </style>
 </head>
 <body>
@@ -200,7 +422,7 @@ def generate_daily_html(items, page_title, filename_with_path, history_sidebar):
         <img src="header_left.jpg" alt="サイトイメージ画像 左">
     </div>
     <div class="header-title-box">
-        <h1>ジョイとパンのおすすめグッズ</h1> 
+        <h1>ジョイとパンのおすすめグッズ</h1>
     </div>
     <div class="header-image">
         <img src="header_right.jpg" alt="サイトイメージ画像 右">
@@ -208,96 +430,182 @@ def generate_daily_html(items, page_title, filename_with_path, history_sidebar):
 </div>
 <div id="container">
     <div id="sidebar">
-        {history_sidebar}
+        """
+
+# 共通ヘッダー部分のサイドバーより後
+POST_SIDEBAR_TEMPLATE = """
     </div>
     <div id="main-content">
         <h2>{page_title}</h2>
         <p class="recommend-label">今週のオススメ</p>
         <ul>
 """
-    
-    # 商品リストのループ
-    for item in items:
-        # --- 価格表示の修正（カンマと「円」の追加） ---
-        formatted_price = item.get('price', '価格不明') 
-        try:
-            price_value = int(item['price'])
-            formatted_price = f"{price_value:,}円"
-        except (ValueError, TypeError):
-            pass 
 
-        # 紹介文を生成
-        desc = generate_description(item['title'])
-        
-        # 💡 修正点: HTML構造を変更し、画像とテキストを分離
-        html_content += f"""
+# 商品1件分
+ITEM_TEMPLATE = """
         <li>
             <div class="item-image-container">
-                <a href="{item['url']}" target="_blank">
-                    <img src="{item['image']}" alt="{item['title']}の商品画像">
+                <a href="{url}" target="_blank">
+                    <img src="{image}" alt="{title}の商品画像">
                 </a>
             </div>
             <div class="item-details">
-                <h2>{item['title']}</h2>
-                <p class="price">価格: {formatted_price}</p>
+                <h2>{title}</h2>
+                <p class="price">価格: {price}</p>
                 <p>{desc}</p>
-                <p><a href="{item['url']}" target="_blank">商品ページへ</a></p>
+                <p><a href="{url}" target="_blank">商品ページへ</a></p>
             </div>
         </li>
         """
 
-    html_content += """
+# 商品ループ内で毎回属性を引かないよう、format_map メソッドをあらかじめ束縛しておく
+render_item = ITEM_TEMPLATE.format_map
+
+# 共通フッター部分
+FOOTER_HTML = """
         </ul>
     </div>
 </div>
 </body>
 </html>"""
 
-    # 結合済みのパス (filename_with_path) を使用して保存
-    with open(filename_with_path, "w", encoding="utf-8") as f:
-        f.write(html_content)
+# テンプレート以外で出力が変わる修正 (エスケープ処理など) を入れた時に上げる番号
+RENDER_VERSION = "3"
+
+# テンプレートや出力の組み立て方が変わったら全ページを再生成させるためのハッシュ
+TEMPLATE_HASH = hashlib.sha1(
+    (RENDER_VERSION + PRE_SIDEBAR_TEMPLATE + POST_SIDEBAR_TEMPLATE + ITEM_TEMPLATE + FOOTER_HTML).encode("utf-8")
+).hexdigest()
+
+# ======================
+# サイドバー入りのヘッダーテンプレートを作る (実行ごとに一度だけ呼ぶ)
+# ======================
+def build_page_header(history_sidebar):
+    # サイドバーは全ページ共通なので、ページごとに埋め込み直さず一度だけ連結する
+    # (残るプレースホルダーは {page_title} だけ。サイドバー内の波括弧は str.format 用にエスケープする)
+    escaped_sidebar = history_sidebar.replace("{", "{{").replace("}", "}}")
+    return PRE_SIDEBAR_TEMPLATE + escaped_sidebar + POST_SIDEBAR_TEMPLATE
+
+# ======================
+# 価格表示の整形（カンマと「円」の追加）
+# ======================
+@lru_cache(maxsize=1024)
+def format_price(price):
+    # 例外処理を使わず、数字のみの価格かどうかを先に判定する
+    # (isdigitは"²"のようなint()で変換できない文字も通すため、isdecimalを使う)
+    if isinstance(price, int) or (isinstance(price, str) and price.isdecimal()):
+        return f"{int(price):,}円"
+    # 数字以外の価格はAPIの文字列がそのまま入るため、HTMLとしてエスケープしておく
+    return html.escape(str(price))
+
+# =========================================================
+# 日ごとの履歴HTMLを生成する関数 (generate_daily_html)
+# =========================================================
+def generate_daily_html(items, page_title, filename_with_path, page_header, desc_map):
     
+    # 前回と同じ内容なら再生成しない (キーはファイル先頭行のコメントに埋め込む)
+    content_key = hashlib.sha1(
+        (json.dumps(items, ensure_ascii=False, sort_keys=True) + page_title + page_header + TEMPLATE_HASH).encode("utf-8")
+    ).hexdigest()
+    key_line = f"<!-- key:{content_key} -->\n"
+    if os.path.exists(filename_with_path):
+        with open(filename_with_path, "r", encoding="utf-8") as f:
+            if f.readline() == key_line:
+                print(f"⏭️ {filename_with_path} は変更がないためスキップしました。")
+                return
+
+    # 紹介文は history.json に保存済みのもの、無ければ main で一括生成済みのものを使う
+    # (AIの生成文には < や & が混ざることがあるため、ページに埋め込む前にエスケープする)
+    descs = [html.escape(item.get('desc') or desc_map.get(item['title'], DESCRIPTION_FALLBACK)) for item in items]
+    # 価格の整形もループの外で一度に済ませておく
+    formatted_prices = [format_price(item.get('price', '価格不明')) for item in items]
+
+    # ページ全体を文字列に溜めず、一時ファイルへ順番に書き出す
+    # (書き終えてから os.replace で置き換えるため、途中で落ちても壊れたページが残らない)
+    tmp_path = filename_with_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", buffering=HTML_WRITE_BUFFER_SIZE) as f:
+        write = f.write # ループ内で毎回属性を引かないよう束縛
+
+        # 紹介文を生成できなかった商品がある場合はキーを埋め込まず、次回に再生成させる
+        if DESCRIPTION_FALLBACK not in descs:
+            write(key_line)
+
+        # HTMLの共通ヘッダー部分
+        # (ページタイトルは履歴の日付から作られるため、<title> と見出しに入れる前にエスケープする)
+        write(page_header.format(page_title=html.escape(page_title)))
+
+        # 商品リストのループ
+        for item, desc, formatted_price in zip(items, descs, formatted_prices):
+            # 💡 修正点: HTML構造を変更し、画像とテキストを分離
+            write(render_item({
+                # URLとタイトルはテンプレートの2か所に入るため、ここで一度だけエスケープする
+                'url': html.escape(item['url']),
+                'image': html.escape(item['image']),
+                'title': html.escape(item['title']),
+                'price': formatted_price,
+                'desc': desc
+            }))
+
+        write(FOOTER_HTML)
+
+    os.replace(tmp_path, filename_with_path)
+
     print(f"✅ {filename_with_path} を生成しました！")
 
 
+# ======================
+# 過去の日付ページを1件生成する関数 (スレッドプールから呼ばれる)
+# ======================
+def generate_history_page(entry, page_header, desc_map):
+    raw_filename = entry.get("filename", f"recommend_{entry['date'].replace('/', '')}.html")
+    filename_with_path = os.path.join(SCRIPT_DIR, raw_filename)
+    page_title = f"{entry['date']} のおすすめペット商品"
+
+    generate_daily_html(entry['items'], page_title, filename_with_path, page_header, desc_map)
+
 # ======================
 # メイン処理 
 # ======================
 if __name__ == "__main__":
     
     # 1. 履歴情報と今日のオススメを取得
-    HISTORY_FILE_PATH = os.path.join(SCRIPT_DIR, HISTORY_FILE_NAME)
-    try:
-        with open(HISTORY_FILE_PATH, "r", encoding="utf-8") as f:
-            history_data = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        history_data = []
+    history_data = load_json_or_default(HISTORY_FILE_PATH, [])
 
     # current_week.jsonから今日のオススメ（トップページ用）を取得
-    CURRENT_WEEK_FILE_PATH = os.path.join(SCRIPT_DIR, CURRENT_WEEK_FILE_NAME)
-    try:
-        with open(CURRENT_WEEK_FILE_PATH, "r", encoding="utf-8") as f:
-            today_items = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        today_items = []
+    today_items = load_json_or_default(CURRENT_WEEK_FILE_PATH, [])
 
     # 2. 過去のオススメHTMLをすべて生成 (サイドバーも同時に生成)
-    history_sidebar_html = generate_history_html() 
+    history_sidebar_html = generate_history_html(history_data) 
+    page_header = build_page_header(history_sidebar_html)
+
+    # history.json に保存済みの紹介文をタイトルごとに集める
+    # (古い current_week.json の商品には紹介文が入っていないため、トップページもここから同じ紹介文を引く)
+    # 同じタイトルが複数の日にある場合は新しい日の紹介文を優先するため、古い日から順に詰める
+    stored_descs = {
+        item['title']: item['desc']
+        for entry in reversed(history_data) for item in entry['items'] if 'desc' in item
+    }
+
+    # 全ページの商品タイトルを集め、紹介文がまだ無いものだけを重複なしでまとめて生成
+    all_titles = [item['title'] for item in today_items if item['title'] not in stored_descs]
+    all_titles += [item['title'] for entry in history_data for item in entry['items'] if item['title'] not in stored_descs]
+    desc_map = build_desc_map(all_titles)
+    desc_map.update(stored_descs)
+
+    # 生成した紹介文は history.json にも書き込み、過去ページの再生成ではAIを呼ばないようにする
+    if store_descs_in_history(history_data, desc_map):
+        dump_json_file(HISTORY_FILE_PATH, history_data)
 
     # 3. トップページ (index.html) の生成
     if today_items:
         index_filename_with_path = os.path.join(SCRIPT_DIR, "index.html")
-        generate_daily_html(today_items, "今週のおすすめペット商品", index_filename_with_path, history_sidebar_html)
+        generate_daily_html(today_items, "今週のおすすめペット商品", index_filename_with_path, page_header, desc_map)
     else:
         print("⚠️ current_week.jsonに商品がないため、index.htmlは生成/更新されませんでした。")
 
 
     # 4. 履歴ファイルが存在する場合のみ、過去の日付ページを生成
     if history_data:
-        for entry in history_data:
-            # 日付ごとの商品ページを生成
-            raw_filename = entry.get("filename", f"recommend_{entry['date'].replace('/', '')}.html")
-            filename_with_path = os.path.join(SCRIPT_DIR, raw_filename) 
-            page_title = f"{entry['date']} のおすすめペット商品"
-            
-            generate_daily_html(entry['items'], page_title, filename_with_path, history_sidebar_html)
\ No newline at end of file
+        # 日付ごとの商品ページは互いに独立しているため、スレッドで並行して生成
+        with ThreadPoolExecutor(max_workers=HISTORY_PAGE_WORKERS) as executor:
+            list(executor.map(generate_history_page, history_data, repeat(page_header), repeat(desc_map)))
\ No newline at end of file